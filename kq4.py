@@ -1,17 +1,27 @@
 import sys
 import os
 import json
+import queue
+import re
 import subprocess
 import threading
 import time
 import webbrowser
-from datetime import date
 from PySide6.QtWidgets import (QApplication, QWidget, QVBoxLayout, QHBoxLayout, 
                                QPushButton, QLabel, QLineEdit, QMessageBox, 
                                QGroupBox, QCheckBox, QFrame, QDialog, QComboBox, 
-                               QDateEdit, QTextEdit)
-from PySide6.QtGui import QTextCursor, QFont
-from PySide6.QtCore import Qt, Signal, QThread, Slot, QDate
+                               QDateEdit, QTextEdit, QPlainTextEdit)
+from PySide6.QtGui import QTextCursor, QFont, QPalette, QColor
+from PySide6.QtCore import Qt, Signal, QThread, Slot, QDate, QRunnable, QThreadPool
+
+# [优化] 有 orjson 就用 orjson 解析配置 (快几倍)，没有则退回标准库 json
+# 写入始终用标准库 (4 空格缩进、保留中文)，保证 config.json 格式不随打包环境变化
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
+json_dumps = lambda o: json.dumps(o, indent=4, ensure_ascii=False).encode('utf-8')
 
 # ==========================================
 # 0. 基础配置与路径
@@ -30,6 +40,39 @@ CONFIG_PATH = os.path.join(USER_DATA_DIR, "config.json")
 # [新增] 历史记录文件路径
 HISTORY_PATH = os.path.join(USER_DATA_DIR, "pairs_history.json")
 
+# [优化] 目录扫描缓存 {(目录, 后缀): (st_mtime_ns, 文件名列表)}，目录没变就直接复用
+_scan_cache = {}
+
+def list_files(folder, suffix):
+    """列出目录下指定后缀的文件名，目录不存在返回 None"""
+    try:
+        mtime = os.stat(folder).st_mtime_ns
+    except OSError:
+        return None
+    key = (folder, suffix)
+    cached = _scan_cache.get(key)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    with os.scandir(folder) as it:
+        names = [e.name for e in it if e.name.endswith(suffix)]
+    _scan_cache[key] = (mtime, names)
+    return names
+
+def open_powershell(command):
+    """在新的 PowerShell 窗口里执行命令 (直接启动，不再经过 cmd.exe 的 start)"""
+    subprocess.Popen(["powershell", "-NoExit", "-Command", command],
+                     cwd=APP_ROOT, creationflags=subprocess.CREATE_NEW_CONSOLE)
+
+def kill_tree(proc):
+    """结束进程及其所有子进程。docker compose 是 docker.exe 再启动的插件进程，
+    只结束 docker.exe 的话插件还握着输出管道，读取端收不到 EOF"""
+    if proc.poll() is not None: return
+    try:
+        subprocess.run(["taskkill", "/T", "/F", "/PID", str(proc.pid)],
+                       capture_output=True, timeout=5, creationflags=subprocess.CREATE_NO_WINDOW)
+    except Exception: pass
+    if proc.poll() is None: proc.kill()
+
 # --- 样式表 ---
 STYLE_LIGHT_ON = "background-color: #2ecc71; border-radius: 10px; border: 2px solid #27ae60;" 
 STYLE_LIGHT_OFF = "background-color: #e74c3c; border-radius: 10px; border: 2px solid #c0392b;" 
@@ -46,42 +89,148 @@ class DockerWorker(QThread):
     log_signal = Signal(str)
     finish_signal = Signal()
 
-    def __init__(self, cmd):
+    FLUSH_LINES = 200       # 攒够多少行发送一次
+    FLUSH_INTERVAL = 0.05   # 最长攒多久 (秒)
+    # 和原来 text 模式一样按 \r\n、\r、\n 分行 (进度条用单独的 \r 刷新)
+    _newline_re = re.compile(rb'\r\n|\r|\n')
+
+    def __init__(self, cmd, project=None):
         super().__init__()
         self.cmd = cmd
+        self.project = project # compose 项目名，取消时只清理这个项目的临时容器
+        self.process = None
+        self._stopped = False
+        self._cleanup = True
+        self._before = None    # 任务开始时已有的临时容器 (快照失败/未完成时为 None)
+        self._buf = []                       # 待发送的日志行
+        self._last_flush = time.monotonic()  # 上次发送时间
+
+    def stop(self, cleanup=True):
+        """请求取消任务，立即返回 (不阻塞界面线程)。
+        run() 会在自己的线程里结束 docker 进程树；cleanup 为 False 时 (退出程序) 不再清理临时容器"""
+        self._cleanup = cleanup
+        self._stopped = True
+
+    def _oneoff_containers(self):
+        """本项目正在运行的 compose run 临时容器 ID；项目未知或查询失败返回 None"""
+        if not self.project: return None
+        try:
+            result = subprocess.run(
+                ["docker", "ps", "-q",
+                 "--filter", f"label=com.docker.compose.project={self.project}",
+                 "--filter", "label=com.docker.compose.oneoff=True"],
+                cwd=APP_ROOT, capture_output=True, text=True, timeout=10,
+                creationflags=subprocess.CREATE_NO_WINDOW
+            )
+            if result.returncode != 0: return None
+            return set(result.stdout.split())
+        except Exception:
+            return None
+
+    def _snapshot(self):
+        """在后台记下任务开始时已有的临时容器，不耽误任务启动"""
+        self._before = self._oneoff_containers()
+
+    def _remove_new_containers(self):
+        """取消后删掉本次任务启动的临时容器 (只结束 docker 客户端不会停掉容器)。
+        快照没拿到或查询失败时宁可不清理，也不误删别的容器"""
+        if self._before is None: return
+        now = self._oneoff_containers()
+        if now is None: return
+        new_ids = now - self._before
+        if not new_ids: return
+        try:
+            subprocess.run(["docker", "rm", "-f", *new_ids], cwd=APP_ROOT, capture_output=True,
+                           timeout=20, creationflags=subprocess.CREATE_NO_WINDOW)
+        except Exception: pass
 
     def run(self):
         try:
             self.log_signal.emit(f"🚀 执行命令:\n{self.cmd}\n{'='*40}\n")
-            process = subprocess.Popen(
+            # 和任务并行拍快照；快照晚于容器创建时新容器会被算进"已有"，最多漏清理，不会误删
+            threading.Thread(target=self._snapshot, daemon=True).start()
+            # [优化] 不经过 shell 直接启动 docker，不再多开一个 cmd.exe
+            # (Windows 下字符串交给 CreateProcess 自己解析，路径里的反斜杠原样保留)
+            process = self.process = subprocess.Popen(
                 self.cmd, 
-                shell=True, 
                 cwd=APP_ROOT, 
                 stdout=subprocess.PIPE, 
-                stderr=subprocess.STDOUT, 
-                text=True, 
-                creationflags=subprocess.CREATE_NO_WINDOW,
-                encoding='utf-8', 
-                errors='replace'
+                stderr=subprocess.STDOUT,
+                bufsize=-1,
+                creationflags=subprocess.CREATE_NO_WINDOW
             )
 
+            # [优化] 子线程按块读取管道 (read1)，这里本地拆行后攒批发送：
+            # 满 FLUSH_LINES 行或距上次发送超过 FLUSH_INTERVAL 秒才 emit 一次，减少跨线程信号
+            q = queue.Queue()
+            threading.Thread(target=self._pump, args=(process.stdout, q), daemon=True).start()
+            buf = b""
             while True:
-                line = process.stdout.readline()
-                if not line and process.poll() is not None:
+                try:
+                    chunk = q.get(timeout=self.FLUSH_INTERVAL)
+                except queue.Empty:
+                    self.flush_log()  # 输出暂停时把攒着的行发出去，避免日志卡住
+                    if self._stopped: break # 已取消：不再等管道 EOF
+                    continue
+                if chunk is None or self._stopped:
                     break
-                if line:
-                    self.log_signal.emit(line.strip())
-            
-            self.log_signal.emit(f"\n{'='*40}\n✅ 任务结束")
+                buf += chunk
+                # 末尾单独的 \r 可能是被拆成两块的 \r\n，留到下一块再分行
+                tail = b"\r" if buf.endswith(b"\r") else b""
+                *lines, buf = self._newline_re.split(buf[:-1] if tail else buf)
+                buf += tail
+                if lines:
+                    self._buf.extend(line.decode('utf-8', 'replace') for line in lines)
+                if len(self._buf) >= self.FLUSH_LINES or time.monotonic() - self._last_flush > self.FLUSH_INTERVAL:
+                    self.flush_log()
+            if buf:
+                self._buf.append(buf.decode('utf-8', 'replace').strip())
+            self.flush_log()
+
+            if self._stopped:
+                kill_tree(process)
+                try: process.wait(timeout=5)
+                except subprocess.TimeoutExpired: pass
+                if self._cleanup: self._remove_new_containers()
+                self.log_signal.emit(f"\n{'='*40}\n⏹ 任务已取消")
+            else:
+                process.wait()
+                self.log_signal.emit(f"\n{'='*40}\n✅ 任务结束")
         except Exception as e:
             self.log_signal.emit(f"❌ 发生错误: {str(e)}")
         finally:
             self.finish_signal.emit()
 
+    @staticmethod
+    def _pump(stream, q):
+        """读管道的子线程：按块读取放入队列，读完放入 None 作为结束标记"""
+        try:
+            while True:
+                chunk = stream.read1(65536)
+                if not chunk:
+                    break
+                q.put(chunk)
+        except (OSError, ValueError):
+            pass # 子进程被结束后管道可能已断开/关闭，当作读完处理
+        finally:
+            q.put(None)
+
+    def flush_log(self):
+        """把攒下的日志行合并成一次信号发出"""
+        if self._buf:
+            self.log_signal.emit("\n".join(self._buf))
+            self._buf = []
+        self._last_flush = time.monotonic()
+
 # ==========================================
 # 2. 实验室弹窗 (回测、下载与优化) - V6.4 更新
 # ==========================================
 class BacktestWindow(QDialog):
+    # [优化] 预编译的拆分/校验正则，币种和 K 线周期共用一次分词
+    # 币种形如 BTC/USDT、BTC/USDT:USDT，也允许 .*/USDT、(BTC|ETH)/USDT 这类正则写法
+    _split_re = re.compile(r'\s+')
+    _pair_re = re.compile(r'^[\w.*+?|()\[\]^$-]+(?:/[\w.*+?|()\[\]^$-]+)?(?::[\w.*+?|()\[\]^$-]+)?$')
+
     def __init__(self, parent=None):
         super().__init__(parent)
         self.setWindowTitle("📊 实验室: 回测 / 下载 / 优化 (Hyperopt)")
@@ -257,9 +406,21 @@ class BacktestWindow(QDialog):
         grp_cmd.setLayout(lay_cmd)
         layout.addWidget(grp_cmd)
 
-        self.txt_log = QTextEdit()
+        # [优化] 纯文本控件 + 限制最大行数，避免富文本解析和日志无限增长
+        self.txt_log = QPlainTextEdit()
         self.txt_log.setReadOnly(True)
-        self.txt_log.setStyleSheet("background-color: #1e1e1e; color: #00ff00; font-family: Consolas; font-size: 10pt;")
+        self.txt_log.setMaximumBlockCount(5000)
+        # [优化] 字体和颜色直接设在控件上 (setFont/setPalette)，不走样式表
+        log_font = QFont("Consolas", 10)
+        log_font.setStyleHint(QFont.Monospace)
+        self.txt_log.setFont(log_font)
+        log_pal = self.txt_log.palette()
+        log_pal.setColor(QPalette.Base, QColor("#1e1e1e"))
+        log_pal.setColor(QPalette.Text, QColor("#00ff00"))
+        self.txt_log.setPalette(log_pal)
+        # [优化] 缓存一个指向文档末尾的光标，追加日志时直接 insertText
+        self._cursor = QTextCursor(self.txt_log.document())
+        self._cursor.movePosition(QTextCursor.End)
         layout.addWidget(self.txt_log)
 
         self.setLayout(layout)
@@ -275,9 +436,8 @@ class BacktestWindow(QDialog):
                         self.line_pairs.addItems(history)
             except: pass
 
-    def save_history(self):
-        """保存当前输入的币种到历史记录 (如果不存在的话)"""
-        current_pair = self.line_pairs.currentText().strip()
+    def save_history(self, current_pair):
+        """保存整理后的币种到历史记录 (如果不存在的话)"""
         if not current_pair: return
 
         # 获取当前所有项
@@ -297,17 +457,25 @@ class BacktestWindow(QDialog):
             except: pass
 
     def scan_files(self):
+        # 窗口复用时重新扫描，保留之前选中的策略和配置
+        prev_strat = self.combo_strat.currentText()
+        prev_conf = self.combo_conf.currentText()
+
         self.combo_strat.clear()
-        if os.path.exists(STRATEGY_DIR):
-            strategies = [f[:-3] for f in os.listdir(STRATEGY_DIR) if f.endswith(".py") and f != "__init__.py"]
+        files = list_files(STRATEGY_DIR, ".py")
+        if files is not None:
+            strategies = [f[:-3] for f in files if f != "__init__.py"]
             if strategies: self.combo_strat.addItems(strategies)
             else: self.combo_strat.addItem("未找到策略")
+        index = self.combo_strat.findText(prev_strat)
+        if index >= 0: self.combo_strat.setCurrentIndex(index)
         
         self.combo_conf.clear()
-        if os.path.exists(USER_DATA_DIR):
-            configs = [f for f in os.listdir(USER_DATA_DIR) if f.endswith(".json")]
+        configs = list_files(USER_DATA_DIR, ".json")
+        if configs is not None:
             self.combo_conf.addItems(configs)
-            index = self.combo_conf.findText("back.json")
+            index = self.combo_conf.findText(prev_conf or "back.json")
+            if index < 0: index = self.combo_conf.findText("back.json")
             if index >= 0: self.combo_conf.setCurrentIndex(index)
 
     def get_time_flags(self, is_backtest=False):
@@ -326,31 +494,48 @@ class BacktestWindow(QDialog):
             d_end = self.date_end.date().toString("yyyyMMdd")
             return f"--timerange {d_start}-{d_end}"
 
+    def split_tokens(self, raw):
+        """按空白分词 (去掉首尾空白)"""
+        raw = raw.strip()
+        return self._split_re.split(raw) if raw else []
+
+    def process_pairs(self, raw):
+        """整理币种输入：分词后校验格式，有不合法的币种时提示并返回 None"""
+        tokens = self.split_tokens(raw)
+        bad = [t for t in tokens if not self._pair_re.match(t)]
+        if bad:
+            QMessageBox.warning(self, "提示", f"以下币种格式不正确，请修改后再生成指令：\n{' '.join(bad)}")
+            return None
+        return " ".join(tokens)
+
     def get_base_cmd(self, is_backtest=False):
+        """生成通用参数；币种输入有误时返回 None，调用方不再生成指令"""
         config_file = self.combo_conf.currentText()
         time_flag = self.get_time_flags(is_backtest=is_backtest)
         
         cmd = f"--config user_data/{config_file} {time_flag}"
         
         # [修改] 使用 currentText() 获取 ComboBox 的输入内容
-        raw_pairs = self.line_pairs.currentText().strip()
-        if raw_pairs:
-            pairs = " ".join(raw_pairs.split())
+        pairs = self.process_pairs(self.line_pairs.currentText())
+        if pairs is None: return None
+        if pairs:
             cmd += f" --pairs {pairs}"
             # [新增] 只要生成基础命令，就尝试保存历史记录
-            self.save_history()
+            self.save_history(pairs)
             
         return cmd
 
     def gen_download_cmd(self):
         base_cmd = self.get_base_cmd(is_backtest=False)
-        tfs = self.line_tf.text().strip()
+        if base_cmd is None: return
+        tfs = " ".join(self.split_tokens(self.line_tf.text()))
         mode_flag = "--trading-mode futures" if self.chk_futures.isChecked() else "--trading-mode spot"
         full_cmd = f"docker compose run --rm freqtrade download-data {base_cmd} {mode_flag} -t {tfs}"
         self.txt_preview.setText(full_cmd)
 
     def gen_backtest_cmd(self):
         base_cmd = self.get_base_cmd(is_backtest=True)
+        if base_cmd is None: return
         strategy = self.combo_strat.currentText()
         export_flag = "--export trades" if self.chk_export.isChecked() else ""
         full_cmd = f"docker compose run --rm freqtrade backtesting {base_cmd} --strategy {strategy} {export_flag}"
@@ -358,6 +543,7 @@ class BacktestWindow(QDialog):
 
     def gen_hyperopt_cmd(self):
         base_cmd = self.get_base_cmd(is_backtest=True)
+        if base_cmd is None: return
         strategy = self.combo_strat.currentText()
         epochs = self.line_epochs.text().strip()
         if not epochs: epochs = "100"
@@ -395,14 +581,52 @@ class BacktestWindow(QDialog):
         self.btn_gen_bt.setEnabled(False)
         self.btn_gen_hyp.setEnabled(False)
         
-        self.worker = DockerWorker(cmd)
-        self.worker.log_signal.connect(self.append_log)
+        self.worker = DockerWorker(cmd, project=self.parent().monitor.project)
+        self.worker.log_signal.connect(self.append_log, Qt.QueuedConnection)
         self.worker.finish_signal.connect(self.on_finished)
         self.worker.start()
 
+    @Slot(str)
     def append_log(self, text):
-        self.txt_log.append(text)
-        self.txt_log.moveCursor(QTextCursor.End)
+        # [优化] 只有原本就停在底部时才自动滚动，用户往上翻看日志时不打扰
+        sb = self.txt_log.verticalScrollBar()
+        at_bottom = sb.value() >= sb.maximum() - 4
+        # 每批日志一个 edit block，只触发一次排版
+        self._cursor.movePosition(QTextCursor.End) # clear() 之后光标位置要重新定位
+        self._cursor.beginEditBlock()
+        # 和原来 append 一样：文档不为空时先换行再写，末尾不留空行
+        if not self._cursor.atStart(): self._cursor.insertBlock()
+        self._cursor.insertText(text)
+        self._cursor.endEditBlock()
+        if at_bottom: sb.setValue(sb.maximum())
+
+    def is_running(self):
+        worker = getattr(self, "worker", None)
+        return bool(worker and worker.isRunning())
+
+    def confirm_stop_worker(self, cleanup=True):
+        """任务还在跑时先确认，用户同意才取消 (不等待线程结束)；返回 False 表示用户选择继续运行"""
+        if not self.is_running(): return True
+        reply = QMessageBox.question(self, "任务运行中",
+                                     "任务还在运行，关闭将终止该任务 (优化进度会丢失)。\n确定要终止吗？",
+                                     QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+        if reply != QMessageBox.Yes: return False
+        self.worker.stop(cleanup=cleanup)
+        return True
+
+    def stop_worker(self):
+        """退出程序时用：取消任务 (跳过容器清理) 并最多等 2 秒线程退出"""
+        if self.is_running():
+            self.worker.stop(cleanup=False)
+            if not self.worker.wait(2000):
+                # 兜底避免销毁仍在运行的 QThread
+                self.worker.terminate()
+                self.worker.wait()
+
+    def reject(self):
+        # 点 X 关闭和按 Esc 都会走到这里：任务在跑时先确认，避免误按 Esc 终止长时间的优化
+        if not self.confirm_stop_worker(): return
+        super().reject()
 
     def on_finished(self):
         self.btn_run.setEnabled(True)
@@ -413,19 +637,91 @@ class BacktestWindow(QDialog):
 # ==========================================
 # 3. 主程序 (FreqtradeManager) - 保持不变
 # ==========================================
+class _CmdRunnable(QRunnable):
+    """在 Qt 线程池里执行一条后台命令 (启动/关机等)"""
+    def __init__(self, argv):
+        super().__init__()
+        self.argv = argv
+
+    def run(self):
+        subprocess.run(self.argv, cwd=APP_ROOT, creationflags=subprocess.CREATE_NO_WINDOW)
+
 class DockerMonitor(QThread):
     status_signal = Signal(bool)
+
+    CMD_TIMEOUT = 10 # 单条 docker 查询命令最多等多久 (秒)
+
+    def __init__(self):
+        super().__init__()
+        self._stop = threading.Event()
+        self._proc = None   # 正在执行的查询命令
+        self._events = None # 正在监听的 docker events
+        self.project = None # compose 项目名，监控线程启动后解析，实验室任务清理容器时也会用到
+
+    def stop(self):
+        """通知监控线程退出，并结束当前正在执行的 docker 子进程 (查询或 events 监听)"""
+        self._stop.set()
+        for proc in (self._proc, self._events):
+            if proc: kill_tree(proc)
+
+    def _run(self, argv):
+        """执行一条 docker 查询命令并返回输出；超时或 stop() 时子进程会被结束"""
+        proc = self._proc = subprocess.Popen(
+            argv, cwd=APP_ROOT, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            text=True, encoding='utf-8', errors='replace',
+            creationflags=subprocess.CREATE_NO_WINDOW
+        )
+        if self._stop.is_set(): kill_tree(proc)
+        try:
+            out, _ = proc.communicate(timeout=self.CMD_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            kill_tree(proc)
+            raise
+        return out
+
+    def get_project(self):
+        """获取 compose 项目名 (启动时查一次)：优先问 docker compose，失败则按 compose 默认规则推算"""
+        try:
+            out = self._run(["docker", "compose", "config", "--format", "json"])
+            name = json.loads(out).get("name")
+            if name: return name
+        except: pass
+        name = os.environ.get("COMPOSE_PROJECT_NAME") or os.path.basename(APP_ROOT)
+        return re.sub(r'[^a-z0-9_-]', '', name.lower())
+
+    def probe(self):
+        """查询一次当前是否有容器在运行"""
+        try:
+            # [优化] 用 docker ps 按 compose 项目标签过滤，不用每次都让 compose 解析 yml
+            out = self._run(
+                ["docker", "ps", "-q",
+                 "--filter", f"label=com.docker.compose.project={self.project}",
+                 "--filter", "label=com.docker.compose.oneoff=False", # 不算回测等 compose run 临时容器
+                 "--filter", "status=running"])
+            if not self._stop.is_set(): self.status_signal.emit(bool(out.strip()))
+        except:
+            if not self._stop.is_set(): self.status_signal.emit(False)
+
     def run(self):
-        while True:
+        # [优化] 不再每 3 秒轮询，改为监听 docker events，只在容器启动/停止时重新查询状态
+        self.project = self.get_project()
+        while not self._stop.is_set():
+            self.probe()
             try:
-                result = subprocess.run(
-                    "docker compose ps --services --filter \"status=running\"", 
-                    shell=True, cwd=APP_ROOT, capture_output=True, text=True,
-                    creationflags=subprocess.CREATE_NO_WINDOW
+                proc = self._events = subprocess.Popen(
+                    ["docker", "events", "--filter", "type=container",
+                     "--filter", f"label=com.docker.compose.project={self.project}",
+                     "--filter", "event=start", "--filter", "event=die",
+                     "--format", "{{.Status}}"],
+                    cwd=APP_ROOT, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                    text=True, bufsize=1, creationflags=subprocess.CREATE_NO_WINDOW
                 )
-                self.status_signal.emit(bool(result.stdout.strip()))
-            except: self.status_signal.emit(False)
-            time.sleep(3) 
+                if self._stop.is_set(): kill_tree(proc)
+                for line in proc.stdout:
+                    self.probe()
+                proc.wait()
+            except: pass
+            if self._stop.wait(3): return # docker 未启动或事件流断开，稍后重连
 
 class FreqtradeManager(QWidget):
     def __init__(self):
@@ -434,6 +730,11 @@ class FreqtradeManager(QWidget):
         self.setGeometry(300, 300, 400, 520)
         
         self.check_env()
+        # [优化] config.json 只读一次缓存在内存，之后在内存修改再写回
+        self._config = None
+        self._config_bytes = None # 最近一次读到/写出的文件内容，用来跳过没有变化的写入
+        self._config_mtime = None
+        self.bt_window = None
         self.init_ui()
         self.load_config()
         
@@ -441,6 +742,19 @@ class FreqtradeManager(QWidget):
         self.monitor.status_signal.connect(self.update_power_light)
         self.monitor.start()
 
+    def closeEvent(self, event):
+        # 关闭主窗口时停掉监控线程和实验室里还在跑的任务，避免残留子进程
+        if self.bt_window and not self.bt_window.confirm_stop_worker(cleanup=False):
+            event.ignore()
+            return
+        self.monitor.stop()
+        if not self.monitor.wait(3000):
+            # 正常不会走到这里 (子进程都已被结束)，兜底避免销毁仍在运行的 QThread
+            self.monitor.terminate()
+            self.monitor.wait()
+        if self.bt_window: self.bt_window.stop_worker()
+        super().closeEvent(event)
+
     def check_env(self):
         if not os.path.exists(CONFIG_PATH):
             QMessageBox.critical(self, "错误", f"找不到配置文件：\n{CONFIG_PATH}")
@@ -457,7 +771,9 @@ class FreqtradeManager(QWidget):
         
         self.light_p = QLabel()
         self.light_p.setFixedSize(20, 20)
-        self.light_p.setStyleSheet(STYLE_LIGHT_ON if False else STYLE_LIGHT_OFF)
+        self.light_p.setStyleSheet(STYLE_LIGHT_OFF)
+        self.light_p.setToolTip("已停止")
+        self._last_light_state = False
         lay_status.addWidget(self.light_p)
         lay_status.addWidget(QLabel("Docker 电源状态"))
         
@@ -472,7 +788,7 @@ class FreqtradeManager(QWidget):
         hbox_btn = QHBoxLayout()
         self.btn_start = QPushButton("▶ 启动电源")
         self.btn_start.setFont(btn_font)
-        self.btn_start.clicked.connect(lambda: self.run_bg("docker compose up -d", "启动指令已发送"))
+        self.btn_start.clicked.connect(lambda: self.run_bg(["docker", "compose", "up", "-d"], "启动指令已发送"))
         
         self.btn_stop = QPushButton("⏹ 切断电源")
         self.btn_stop.clicked.connect(self.confirm_stop)
@@ -533,7 +849,7 @@ class FreqtradeManager(QWidget):
         b1 = QPushButton("🌐 FreqUI (网页)")
         b1.clicked.connect(lambda: webbrowser.open("http://127.0.0.1:8080"))
         b2 = QPushButton("📂 打开文件夹")
-        b2.clicked.connect(lambda: subprocess.Popen(f'explorer "{APP_ROOT}"'))
+        b2.clicked.connect(lambda: subprocess.Popen(["explorer", APP_ROOT]))
         lay_link.addWidget(b1)
         lay_link.addWidget(b2)
         grp_link.setLayout(lay_link)
@@ -543,25 +859,59 @@ class FreqtradeManager(QWidget):
 
     # --- 功能函数 ---
     def open_backtest_window(self):
-        self.bt_window = BacktestWindow(self)
+        # [优化] 实验室窗口只创建一次，再次打开时只刷新文件列表 (同时保留上次填写的参数)
+        if self.bt_window is None:
+            self.bt_window = BacktestWindow(self)
+        else:
+            self.bt_window.scan_files()
         self.bt_window.show()
+        self.bt_window.raise_()
+        self.bt_window.activateWindow()
 
     def open_terminal(self):
-        subprocess.Popen(f'start powershell -NoExit -Command "cd \'{APP_ROOT}\'"', shell=True)
+        open_powershell(f"cd '{APP_ROOT}'")
 
     @Slot(bool)
     def update_power_light(self, on):
+        # [优化] 状态没变就不重设样式表，避免重复解析 CSS
+        if on == self._last_light_state: return
+        self._last_light_state = on
         self.light_p.setStyleSheet(STYLE_LIGHT_ON if on else STYLE_LIGHT_OFF)
         self.light_p.setToolTip("运行中" if on else "已停止")
 
     def view_logs(self):
-        cmd = f'start powershell -NoExit -Command "cd \'{APP_ROOT}\'; echo 正在连接日志...; docker compose logs -f"'
-        subprocess.Popen(cmd, shell=True, cwd=APP_ROOT)
+        open_powershell(f"cd '{APP_ROOT}'; echo 正在连接日志...; docker compose logs -f")
+
+    def get_config(self):
+        """返回内存中的配置；首次调用或文件被外部修改过时才重新读取"""
+        mtime = os.stat(CONFIG_PATH).st_mtime_ns
+        if self._config is None or mtime != self._config_mtime:
+            with open(CONFIG_PATH, 'rb') as f:
+                raw = f.read()
+            self._config = json_loads(raw)
+            self._config_bytes = raw
+            self._config_mtime = mtime
+        return self._config
+
+    def _write_config(self):
+        """把内存中的配置原子写回 config.json (先写临时文件再替换)，内容没变就不写"""
+        new = json_dumps(self._config)
+        if new == self._config_bytes: return
+        tmp = CONFIG_PATH + ".tmp"
+        try:
+            with open(tmp, 'wb') as f:
+                f.write(new)
+            os.replace(tmp, CONFIG_PATH)
+        except Exception:
+            # 写入失败 (如文件被占用)：丢弃内存里未保存的修改，下次重新从文件读取
+            self._config = None
+            raise
+        self._config_bytes = new
+        self._config_mtime = os.stat(CONFIG_PATH).st_mtime_ns
 
     def load_config(self):
         try:
-            with open(CONFIG_PATH, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            data = self.get_config()
             is_dry = data.get("dry_run", True)
             self.chk_dry.blockSignals(True)
             self.chk_dry.setChecked(is_dry)
@@ -580,7 +930,12 @@ class FreqtradeManager(QWidget):
             if reply == QMessageBox.No:
                 self.chk_dry.setChecked(True)
                 return
-        self.update_json("dry_run", chk)
+        if not self.update_json("dry_run", chk):
+            QMessageBox.critical(self, "错误", "保存配置失败，模式未切换。")
+            self.chk_dry.blockSignals(True)
+            self.chk_dry.setChecked(not chk)
+            self.chk_dry.blockSignals(False)
+            return
         QMessageBox.information(self, "保存", f"已切换为 {'模拟盘' if chk else '实盘'}，请点击【重启生效】。")
 
     def save_port(self):
@@ -588,33 +943,32 @@ class FreqtradeManager(QWidget):
         if not port.isdigit(): return
         proxy_str = f"http://host.docker.internal:{port}"
         try:
-            with open(CONFIG_PATH, 'r', encoding='utf-8') as f: data = json.load(f)
+            data = self.get_config()
             if "exchange" not in data: data["exchange"] = {}
             if "ccxt_config" not in data["exchange"]: data["exchange"]["ccxt_config"] = {"enableRateLimit": True}
             data["exchange"]["ccxt_config"]["proxies"] = {"http": proxy_str, "https": proxy_str}
-            with open(CONFIG_PATH, 'w', encoding='utf-8') as f: json.dump(data, f, indent=4, ensure_ascii=False)
+            self._write_config()
             QMessageBox.information(self, "成功", "端口已保存，请点击【重启生效】。")
         except Exception as e: QMessageBox.critical(self, "错误", str(e))
 
     def update_json(self, k, v):
         try:
-            with open(CONFIG_PATH, 'r', encoding='utf-8') as f: d=json.load(f)
-            d[k]=v
-            with open(CONFIG_PATH, 'w', encoding='utf-8') as f: json.dump(d,f,indent=4,ensure_ascii=False)
+            self.get_config()[k]=v
+            self._write_config()
             return True
         except Exception as e: return False
 
     def run_bg(self, cmd, msg):
-        threading.Thread(target=lambda: subprocess.run(cmd,shell=True,cwd=APP_ROOT,creationflags=subprocess.CREATE_NO_WINDOW)).start()
+        QThreadPool.globalInstance().start(_CmdRunnable(cmd))
         if msg: QMessageBox.information(self,"提示",msg)
 
     def confirm_stop(self):
         if QMessageBox.question(self,"关机","确定彻底关闭机器人电源吗？")==QMessageBox.Yes: 
-            self.run_bg("docker compose down","已发送关机指令")
+            self.run_bg(["docker", "compose", "down"],"已发送关机指令")
 
     def confirm_restart(self):
         if QMessageBox.question(self,"重启","确定重启容器吗？")==QMessageBox.Yes:
-            subprocess.Popen(f'start powershell -NoExit -Command "cd \'{APP_ROOT}\'; docker compose restart; echo 重启完成"', shell=True)
+            open_powershell(f"cd '{APP_ROOT}'; docker compose restart; echo 重启完成")
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)